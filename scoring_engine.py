@@ -1,3 +1,4 @@
+import importlib.util
 import json
 import math
 import sys
@@ -70,23 +71,24 @@ def run_phpstan(target_path):
     except Exception as e:
         return {"error": str(e)}
 
+VALIDATORS_RUNNER = None
+
 def run_domain_validators(target_path):
-    """Run all domain validators from scripts/validators."""
-    results = {}
-    validators_dir = "scripts/validators"
-    if not os.path.exists(validators_dir):
-        return results
-    
-    for validator in os.listdir(validators_dir):
-        if validator.endswith("_validator.py"):
-            name = validator.replace("_validator.py", "")
-            cmd = [sys.executable, os.path.join(validators_dir, validator), target_path]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            results[name] = {
-                "passed": result.returncode == 0,
-                "output": result.stdout + result.stderr
-            }
-    return results
+    """Run all domain validators from scripts/validators in this process."""
+    global VALIDATORS_RUNNER
+    runner = "scripts/validators_runner.py"
+    if not os.path.exists(runner):
+        return {}
+
+    if VALIDATORS_RUNNER is None:
+        try:
+            spec = importlib.util.spec_from_file_location("validators_runner", runner)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except Exception as e:
+            return {"runner": {"passed": False, "output": f"Could not load {runner}: {e}"}}
+        VALIDATORS_RUNNER = module
+    return VALIDATORS_RUNNER.run_validators(target_path)
 
 def generate_report(results, output_file="report.md"):
     """Generate Markdown report."""
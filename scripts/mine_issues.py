@@ -9,9 +9,13 @@ GITLAB_PROJECT_ID = "59858"
 GITLAB_API = f"https://git.drupalcode.org/api/v4/projects/{GITLAB_PROJECT_ID}/merge_requests"
 DRUPAL_GIT_BASE = "https://git.drupalcode.org/project/drupal/-/merge_requests/"
 
+PHPUNIT_TEST_PATH_RE = re.compile(r'tests/src/(?:Unit|Kernel|Functional|ExistingSite)')
+
 HEADERS = {
     "User-Agent": "DrupalBench/0.1 (Benchmark for LLMs; contact: user@example.com)"
 }
+# Mining walks hundreds of issues on the same two hosts; keep connections open.
+HTTP_SESSION = requests.Session()
 
 def search_gitlab_mr(nid):
     params = {
@@ -19,7 +23,7 @@ def search_gitlab_mr(nid):
         "search": str(nid)
     }
     try:
-        response = requests.get(GITLAB_API, params=params, headers=HEADERS)
+        response = HTTP_SESSION.get(GITLAB_API, params=params, headers=HEADERS)
         if response.status_code == 200:
             mrs = response.json()
             # Prefer merged MRs, then opened ones
@@ -34,21 +38,12 @@ def search_gitlab_mr(nid):
     return None
 
 def has_phpunit_tests(diff_text):
-    test_patterns = [
-        r'tests/src/Unit',
-        r'tests/src/Kernel',
-        r'tests/src/Functional',
-        r'tests/src/ExistingSite'
-    ]
-    for pattern in test_patterns:
-        if re.search(pattern, diff_text):
-            return True
-    return False
+    return PHPUNIT_TEST_PATH_RE.search(diff_text) is not None
 
 def get_mr_diff(iid):
     diff_url = f"{DRUPAL_GIT_BASE}{iid}.diff"
     try:
-        response = requests.get(diff_url, headers=HEADERS)
+        response = HTTP_SESSION.get(diff_url, headers=HEADERS)
         if response.status_code == 200:
             return response.text
     except Exception as e:
@@ -96,7 +91,7 @@ def main():
                     "direction": "DESC"
                 }
                 try:
-                    response = requests.get(url, params=params, headers=HEADERS)
+                    response = HTTP_SESSION.get(url, params=params, headers=HEADERS)
                     if response.status_code == 429:
                         print("Rate limit hit, sleeping...")
                         time.sleep(30)
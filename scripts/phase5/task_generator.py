@@ -10,14 +10,23 @@ import argparse
 sys.path.append(os.getcwd())
 
 def load_env():
+    # Variables already set in the environment take precedence over .env.
     env = {}
-    if os.path.exists(".env"):
+    try:
         with open(".env", "r") as f:
             for line in f:
-                if "=" in line and not line.startswith("#"):
-                    key, value = line.split("=", 1)
-                    env[key.strip()] = value.strip()
-    return env
+                if line.startswith("#"):
+                    continue
+                key, sep, value = line.partition("=")
+                if sep:
+                    key = key.strip().removeprefix("export ").strip()
+                    value = value.strip()
+                    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+                        value = value[1:-1]
+                    env[key] = value
+    except FileNotFoundError:
+        pass
+    return {**env, **os.environ}
 
 ENV = load_env()
 MODEL_PROVIDER = ENV.get("MODEL_PROVIDER", "gemini")
@@ -30,20 +39,27 @@ OPENROUTER_BASE_URL = ENV.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/
 OPENROUTER_HTTP_REFERER = ENV.get("OPENROUTER_HTTP_REFERER")
 OPENROUTER_X_TITLE = ENV.get("OPENROUTER_X_TITLE")
 MODEL_REQUEST_TIMEOUT = 15 * 60
+HTTP_SESSION = requests.Session()
+CHANGE_RECORD_LINK_RE = re.compile(r'<td\s+class="views-field views-field-title"[^>]*>\s*<a\s+href="([^"]+)"[^>]*>([^<]+)</a>')
+DESCRIPTION_BODY_RE = re.compile(r'<div class="field field-name-field-description[^>]*>(.*?)</div>\s*</div>', re.DOTALL)
+FIELD_BODY_RE = re.compile(r'<div class="field field-name-body[^>]*>(.*?)</div>\s*</div>', re.DOTALL)
+ENCODED_BODY_RE = re.compile(r'<div class="field-item even" property="content:encoded">(.*?)</div>', re.DOTALL)
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
 
 def scrape_change_records(limit=5):
     url = "https://www.drupal.org/list-changes/drupal"
     headers = {"User-Agent": "DrupalBench/0.1"}
     print(f"Fetching {url}...")
     try:
-        response = requests.get(url, headers=headers)
+        response = HTTP_SESSION.get(url, headers=headers)
         response.raise_for_status()
     except Exception as e:
         print(f"Error fetching change records: {e}")
         return []
     
     # Broaden regex to find links to change records
-    links = re.findall(r'<td\s+class="views-field views-field-title"[^>]*>\s*<a\s+href="([^"]+)"[^>]*>([^<]+)</a>', response.text)
+    links = CHANGE_RECORD_LINK_RE.findall(response.text)
     
     print(f"Regex found {len(links)} candidate links.")
     
@@ -56,20 +72,20 @@ def scrape_change_records(limit=5):
         print(f"Fetching change record: {full_url}...")
         
         try:
-            rec_res = requests.get(full_url, headers=headers)
+            rec_res = HTTP_SESSION.get(full_url, headers=headers)
             rec_res.raise_for_status()
             
             # Extract body content
-            body_match = re.search(r'<div class="field field-name-field-description[^>]*>(.*?)</div>\s*</div>', rec_res.text, re.DOTALL)
+            body_match = DESCRIPTION_BODY_RE.search(rec_res.text)
             if not body_match:
-                body_match = re.search(r'<div class="field field-name-body[^>]*>(.*?)</div>\s*</div>', rec_res.text, re.DOTALL)
+                body_match = FIELD_BODY_RE.search(rec_res.text)
             if not body_match:
-                body_match = re.search(r'<div class="field-item even" property="content:encoded">(.*?)</div>', rec_res.text, re.DOTALL)
+                body_match = ENCODED_BODY_RE.search(rec_res.text)
                 
             if body_match:
                 content = body_match.group(1)
-                content = re.sub(r'<[^>]+>', '', content).strip()
-                content = re.sub(r'\s+', ' ', content)
+                content = HTML_TAG_RE.sub('', content).strip()
+                content = WHITESPACE_RE.sub(' ', content)
                 
                 records.append({
                     "title": title.strip(),
@@ -122,7 +138,7 @@ def generate_task_gemini(prompt):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, json=payload)
+            response = HTTP_SESSION.post(url, json=payload)
             if response.status_code == 429:
                 wait_time = (attempt + 1) * 5
                 time.sleep(wait_time)
@@ -151,7 +167,7 @@ def generate_task_ollama(prompt):
     }
 
     try:
-        response = requests.post(url, json=payload)
+        response = HTTP_SESSION.post(url, json=payload)
         if response.status_code != 200:
             print(f"  Ollama Error {response.status_code}: {response.text}")
             return None
@@ -305,7 +321,7 @@ def generate_task_openai(prompt):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=MODEL_REQUEST_TIMEOUT)
+            response = HTTP_SESSION.post(url, json=payload, headers=headers, timeout=MODEL_REQUEST_TIMEOUT)
             if response.status_code == 429:
                 wait_time = (attempt + 1) * 5
                 time.sleep(wait_time)
@@ -348,7 +364,7 @@ def generate_task_openrouter(prompt):
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=MODEL_REQUEST_TIMEOUT)
+            response = HTTP_SESSION.post(url, json=payload, headers=headers, timeout=MODEL_REQUEST_TIMEOUT)
             if response.status_code == 429:
                 wait_time = (attempt + 1) * 5
                 time.sleep(wait_time)
@@ -65,12 +65,8 @@ def validate_file(file_path):
         
     return violations
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python backend_validator.py <file_or_directory>")
-        sys.exit(1)
-    
-    target = sys.argv[1]
+def validate(target, walk=None):
+    """Validate a file or directory; walk is an optional precomputed os.walk()."""
     all_violations = {}
     
     if os.path.isfile(target):
@@ -78,7 +74,7 @@ if __name__ == "__main__":
         if v:
             all_violations[target] = v
     elif os.path.isdir(target):
-        for root, _, files in os.walk(target):
+        for root, _, files in (walk if walk is not None else os.walk(target)):
             for file in files:
                 if file.endswith('.php') or file.endswith('.module') or file.endswith('.inc'):
                     path = os.path.join(root, file)
@@ -87,12 +83,19 @@ if __name__ == "__main__":
                         all_violations[path] = v
     
     if all_violations:
-        print("Backend Validation Failed:")
+        lines = ["Backend Validation Failed:"]
         for path, violations in all_violations.items():
-            print(f"  {path}:")
+            lines.append(f"  {path}:")
             for v in violations:
-                print(f"    - {v}")
+                lines.append(f"    - {v}")
+        return False, "\n".join(lines)
+    return True, "Backend Validation Passed."
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python backend_validator.py <file_or_directory>")
         sys.exit(1)
-    else:
-        print("Backend Validation Passed.")
-        sys.exit(0)
+    
+    passed, output = validate(sys.argv[1])
+    print(output)
+    sys.exit(0 if passed else 1)
@@ -44,12 +44,8 @@ def validate_sdc_directory(directory):
 
     return violations
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python frontend_validator.py <sdc_directory_or_parent>")
-        sys.exit(1)
-
-    target = sys.argv[1]
+def validate(target, walk=None):
+    """Validate an SDC directory or a parent of them; walk is an optional precomputed os.walk()."""
     all_violations = {}
 
     # Check if target is itself an SDC dir (has .component.yml) or parent of them
@@ -59,19 +55,26 @@ if __name__ == "__main__":
             all_violations[target] = v
     else:
         # Search for subdirectories that look like SDC components
-        for root, dirs, files in os.walk(target):
+        for root, dirs, files in (walk if walk is not None else os.walk(target)):
             if any(f.endswith(".component.yml") for f in files):
                 v = validate_sdc_directory(root)
                 if v:
                     all_violations[root] = v
 
     if all_violations:
-        print("Frontend (SDC) Validation Failed:")
+        lines = ["Frontend (SDC) Validation Failed:"]
         for path, violations in all_violations.items():
-            print(f"  {path}:")
+            lines.append(f"  {path}:")
             for v in violations:
-                print(f"    - {v}")
+                lines.append(f"    - {v}")
+        return False, "\n".join(lines)
+    return True, "Frontend (SDC) Validation Passed."
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python frontend_validator.py <sdc_directory_or_parent>")
         sys.exit(1)
-    else:
-        print("Frontend (SDC) Validation Passed.")
-        sys.exit(0)
+
+    passed, output = validate(sys.argv[1])
+    print(output)
+    sys.exit(0 if passed else 1)
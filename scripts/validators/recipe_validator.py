@@ -2,32 +2,32 @@ import subprocess
 import sys
 import os
 
-def run_drush_recipe(recipe_path):
+def run_drush_recipe(recipe_path, log=print):
     # Assumes drush is in the path and we are in a Drupal root or have -r
     # For DrupalBench, we might need to specify the path to the Drupal root
     drupal_root = os.environ.get('DRUPAL_ROOT', '/var/www/html/web')
     
     cmd = ["drush", "recipe", recipe_path, "-r", drupal_root, "--yes"]
-    print(f"Running: {' '.join(cmd)}")
+    log(f"Running: {' '.join(cmd)}")
     result = subprocess.run(cmd, capture_output=True, text=True)
     return result
 
-def validate_recipe_idempotency(recipe_path):
+def validate_recipe_idempotency(recipe_path, log=print):
     if not os.path.exists(recipe_path):
         return [f"Recipe path does not exist: {recipe_path}"]
 
     violations = []
     
     # First application
-    print(f"Applying recipe first time: {recipe_path}")
-    res1 = run_drush_recipe(recipe_path)
+    log(f"Applying recipe first time: {recipe_path}")
+    res1 = run_drush_recipe(recipe_path, log)
     if res1.returncode != 0:
         violations.append(f"First application failed: {res1.stderr}")
         return violations
 
     # Second application (Idempotency check)
-    print(f"Applying recipe second time (idempotency check): {recipe_path}")
-    res2 = run_drush_recipe(recipe_path)
+    log(f"Applying recipe second time (idempotency check): {recipe_path}")
+    res2 = run_drush_recipe(recipe_path, log)
     if res2.returncode != 0:
         violations.append(f"Second application (idempotency) failed: {res2.stderr}")
     
@@ -36,23 +36,26 @@ def validate_recipe_idempotency(recipe_path):
     
     return violations
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python recipe_validator.py <recipe_name_or_path>")
-        sys.exit(1)
-
-    recipe_target = sys.argv[1]
-    
+def validate(target, walk=None):
+    """Validate a recipe; walk is accepted for interface parity with the other validators."""
     # If it's a directory but doesn't have recipe.yml, it might be a module/theme containing recipes
     # But usually recipes are standalone directories.
-    
-    v = validate_recipe_idempotency(recipe_target)
+    lines = []
+    v = validate_recipe_idempotency(target, log=lines.append)
     
     if v:
-        print("Recipe Idempotency Validation Failed:")
+        lines.append("Recipe Idempotency Validation Failed:")
         for err in v:
-            print(f"  - {err}")
+            lines.append(f"  - {err}")
+        return False, "\n".join(lines)
+    lines.append("Recipe Idempotency Validation Passed.")
+    return True, "\n".join(lines)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python recipe_validator.py <recipe_name_or_path>")
         sys.exit(1)
-    else:
-        print("Recipe Idempotency Validation Passed.")
-        sys.exit(0)
+
+    passed, output = validate(sys.argv[1])
+    print(output)
+    sys.exit(0 if passed else 1)
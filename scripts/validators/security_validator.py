@@ -39,12 +39,8 @@ def validate_file(file_path):
     
     return check_access_policy_implementation(content)
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python security_validator.py <file_or_directory>")
-        sys.exit(1)
-    
-    target = sys.argv[1]
+def validate(target, walk=None):
+    """Validate a file or directory; walk is an optional precomputed os.walk()."""
     all_violations = {}
     
     if os.path.isfile(target):
@@ -52,7 +48,7 @@ if __name__ == "__main__":
         if v:
             all_violations[target] = v
     elif os.path.isdir(target):
-        for root, _, files in os.walk(target):
+        for root, _, files in (walk if walk is not None else os.walk(target)):
             for file in files:
                 if file.endswith('.php'):
                     path = os.path.join(root, file)
@@ -61,12 +57,19 @@ if __name__ == "__main__":
                         all_violations[path] = v
     
     if all_violations:
-        print("Security (Access Policy) Validation Failed:")
+        lines = ["Security (Access Policy) Validation Failed:"]
         for path, violations in all_violations.items():
-            print(f"  {path}:")
+            lines.append(f"  {path}:")
             for v in violations:
-                print(f"    - {v}")
+                lines.append(f"    - {v}")
+        return False, "\n".join(lines)
+    return True, "Security (Access Policy) Validation Passed."
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python security_validator.py <file_or_directory>")
         sys.exit(1)
-    else:
-        print("Security (Access Policy) Validation Passed.")
-        sys.exit(0)
+    
+    passed, output = validate(sys.argv[1])
+    print(output)
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,55 @@
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+VALIDATORS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "validators")
+VALIDATORS = [(filename.replace("_validator.py", ""), os.path.join(VALIDATORS_DIR, filename))
+              for filename in sorted(os.listdir(VALIDATORS_DIR)) if filename.endswith("_validator.py")] if os.path.isdir(VALIDATORS_DIR) else []
+LOADED_VALIDATORS = None
+
+def load_validators():
+    """Import every *_validator.py module once and return {name: validate}."""
+    global LOADED_VALIDATORS
+    if LOADED_VALIDATORS is not None:
+        return LOADED_VALIDATORS
+    validators = {}
+    for name, path in VALIDATORS:
+        try:
+            spec = importlib.util.spec_from_file_location(f"{name}_validator", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            validators[name] = module.validate
+        except Exception as e:
+            validators[name] = e
+    LOADED_VALIDATORS = validators
+    return validators
+
+def run_validator(name, validate, target_path, walk):
+    if isinstance(validate, Exception):
+        return {"passed": False, "output": f"Could not load {name} validator: {validate}"}
+    try:
+        passed, output = validate(target_path, walk)
+    except Exception as e:
+        passed, output = False, f"{type(e).__name__}: {e}"
+    return {"passed": passed, "output": output}
+
+def run_validators(target_path):
+    """Run all domain validators against target_path in this process."""
+    # Walk the tree once and share it, instead of one traversal per validator.
+    walk = list(os.walk(target_path)) if os.path.isdir(target_path) else None
+    validators = load_validators()
+    # The validators are independent and mostly wait on file reads or drush,
+    # so they run side by side; results keep discovery order.
+    with ThreadPoolExecutor(max_workers=max(1, len(validators))) as executor:
+        futures = {name: executor.submit(run_validator, name, validate, target_path, walk)
+                   for name, validate in validators.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python validators_runner.py <file_or_directory>")
+        sys.exit(1)
+
+    print(json.dumps(run_validators(sys.argv[1]), indent=2))